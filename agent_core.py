@@ -0,0 +1,342 @@
+import sys
+import json
+import sqlite3
+import httpx
+import hashlib
+import logging
+import operator
+import threading
+
+from enum import Enum
+from functools import reduce
+from itertools import takewhile
+from collections import OrderedDict
+from logging.handlers import QueueHandler
+from datetime import datetime, timezone
+from typing import TypedDict, Annotated, List, Literal, Optional
+from typing_extensions import TypedDict as SchemaDict
+from cachetools import TTLCache
+
+from langgraph.graph import StateGraph, END
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.prebuilt import ToolNode
+from langchain_openai import ChatOpenAI
+from langchain_core.load import dumps, loads
+from langchain_core.tools import BaseTool, ToolException, tool
+from langchain_core.runnables import RunnableBinding, RunnableConfig
+from langchain_core.messages import AnyMessage, SystemMessage, AIMessage, HumanMessage, ToolMessage, message_chunk_to_message
+
+logger = logging.getLogger(__name__)
+
+_FINAL_MARKER = "final state:"
+_COMPLETION_CACHE_SIZE = 1024
+_COMPLETIONS: OrderedDict[tuple, AIMessage] = OrderedDict()
+_COMPLETION_STORE: Optional[sqlite3.Connection] = None
+_GRAPH_CACHE_SIZE = 32
+_GRAPH_CACHE: OrderedDict[tuple, CompiledStateGraph] = OrderedDict()
+_TOOL_NOTICES = {
+    "check_conflicting_appointment": lambda args: f"Та түр хүлээгээрэй. {args.get('dt')}-ийн үед үсчин маань сул эсэхийг шалгаж байна...",
+    "check_conflicts_batch": lambda args: f"Та түр хүлээгээрэй. {len(args.get('slots', []))} цагийг үсчин маань сул эсэхийг шалгаж байна...",
+}
+_RESULT_NOTICES = {
+    "set_appointment": lambda args: f"Таны захиалгыг бүртгэлээ. {args.get('appointment_time')}-д манай {args.get('branch')}-р салбар дээр уулзацгаая.",
+}
+
+class DeferredQueueHandler(QueueHandler):
+    # QueueHandler.prepare formats on the logging thread; handing the record over as-is leaves str(args) to the listener
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+class Decision(Enum):
+    THINK = 0
+    ACT = 1
+    END = 2
+
+class AgentState(TypedDict):
+    messages: Annotated[List[AnyMessage], operator.add]
+
+def digest_messages(messages: List[AnyMessage]) -> str:
+    # Tool call ids are random per completion, so only names and arguments take part in the key
+    h = hashlib.blake2b(digest_size=16)
+    for m in messages:
+        h.update(m.type.encode() + b"\0")
+        h.update(str(m.content).encode())
+        if isinstance(m, AIMessage):
+            h.update(json.dumps([(c['name'], c['args']) for c in m.tool_calls], sort_keys=True, ensure_ascii=False).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+def announce_tool_calls(calls: List[dict]) -> None:
+    notices = [_TOOL_NOTICES[c['name']](c['args']) for c in calls if c['name'] in _TOOL_NOTICES]
+    if notices:
+        sys.stdout.write("\n".join(notices) + "\n")
+        sys.stdout.flush()
+    
+def use_completion_store(path: str) -> None:
+    # Persists the completion cache across runs, the way SQLiteCache would through set_llm_cache
+    global _COMPLETION_STORE
+    store = sqlite3.connect(path, check_same_thread=False)
+    store.execute("CREATE TABLE IF NOT EXISTS completions (scope TEXT, digest TEXT, message TEXT, PRIMARY KEY (scope, digest))")
+    _COMPLETION_STORE = store
+
+def _cached_completion(key: tuple) -> Optional[AIMessage]:
+    response = _COMPLETIONS.get(key)
+    if response is not None:
+        _COMPLETIONS.move_to_end(key)
+        return response
+    if _COMPLETION_STORE is not None:
+        row = _COMPLETION_STORE.execute("SELECT message FROM completions WHERE scope = ? AND digest = ?", key).fetchone()
+        if row is not None:
+            response = _remember_completion(key, loads(row[0]), persist=False)
+    return response
+
+def _remember_completion(key: tuple, response: AIMessage, persist: bool = True) -> AIMessage:
+    _COMPLETIONS[key] = response
+    if len(_COMPLETIONS) > _COMPLETION_CACHE_SIZE:
+        _COMPLETIONS.popitem(last=False)
+    if persist and _COMPLETION_STORE is not None:
+        with _COMPLETION_STORE:
+            _COMPLETION_STORE.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?)", (*key, dumps(response)))
+    return response
+
+def announce_tool_results(messages: List[AnyMessage]) -> None:
+    # Confirmations wait for the tool node, and are skipped for the calls that failed
+    results = list(takewhile(lambda m: isinstance(m, ToolMessage), reversed(messages)))
+    request = messages[-len(results) - 1] if results and len(messages) > len(results) else None
+    if not isinstance(request, AIMessage):
+        return
+    args = { c['id'] : c['args'] for c in request.tool_calls }
+    notices = [_RESULT_NOTICES[r.name](args.get(r.tool_call_id, {})) for r in reversed(results)
+               if r.name in _RESULT_NOTICES and r.status != "error"]
+    if notices:
+        sys.stdout.write("\n".join(notices) + "\n")
+        sys.stdout.flush()
+
+def _after_action(state: AgentState) -> str:
+    announce_tool_results(state['messages'])
+    return "llm"
+
+async def _llm_node(state: AgentState, config: RunnableConfig) -> dict:
+    return await config["configurable"]["agent"].call_model(state)
+
+def _next_move(state: AgentState, config: RunnableConfig) -> Decision:
+    return config["configurable"]["agent"].next_move(state)
+
+def tool_graph(tools: List[BaseTool]) -> CompiledStateGraph:
+    # The graph depends only on the tools; the Agent driving a run is read from its config, so no instance is pinned here
+    key = tuple(sorted(id(t) for t in tools))
+    graph = _GRAPH_CACHE.get(key)
+    if graph is not None:
+        _GRAPH_CACHE.move_to_end(key)
+        return graph
+    
+    builder = StateGraph(AgentState)
+    builder.add_node("llm", _llm_node)
+    builder.add_node("action", ToolNode(tools))
+    builder.add_conditional_edges("llm", _next_move, {Decision.THINK: "llm", Decision.ACT: "action", Decision.END: END})
+    builder.add_conditional_edges("action", _after_action, ["llm"])
+    builder.set_entry_point("llm")
+    graph = _GRAPH_CACHE[key] = builder.compile()
+    if len(_GRAPH_CACHE) > _GRAPH_CACHE_SIZE:
+        _GRAPH_CACHE.popitem(last=False)
+    return graph
+    
+class Agent:
+    
+    def __init__(self, model: ChatOpenAI, tools: List[BaseTool], system:str=""):
+        self.system = system
+        self._system_prefix = [SystemMessage(content=system)] if system else []
+        self.tools = { t.name : t for t in tools }
+        self._base_model = model
+        self.model = model.bind_tools(tools)
+        # Conversations on the same model settings and tool set share completions through _COMPLETIONS
+        scope = json.dumps([type(model).__name__, model._identifying_params, sorted(self.tools)], sort_keys=True, default=str)
+        self._cache_scope = hashlib.blake2b(scope.encode(), digest_size=16).hexdigest()
+        # A RunnableBinding deep-merges `configurable` with the caller's config, where Pregel.with_config would let it be replaced
+        self.graph = RunnableBinding(bound=tool_graph(tools), config={ "configurable" : { "agent" : self } })
+        
+    async def call_model(self, state: AgentState) -> dict:
+        messages = self._system_prefix + state['messages']
+        key = (self._cache_scope, digest_messages(messages))
+        
+        response = _cached_completion(key)
+        if response is None:
+            chunks = [chunk async for chunk in self.model.astream(messages)]
+            response = _remember_completion(key, message_chunk_to_message(reduce(operator.add, chunks)))
+            
+        return { "messages" : [response] }
+    
+    def next_move(self, state: AgentState) -> Literal[Decision.THINK, Decision.ACT, Decision.END]:
+        llm_message = state["messages"][-1]
+        if not isinstance(llm_message, AIMessage):
+            return Decision.END
+        
+        content, calls = llm_message.content, llm_message.tool_calls
+        if calls:
+            if content:
+                logger.debug("CONTENT and TOOL_CALLS both satisfied!")
+            logger.debug("ACTION: %s(%s)", calls[0]['name'], calls[0]['args'])
+            announce_tool_calls(calls)
+            return Decision.ACT
+        if content:
+            if isinstance(content, str) and _FINAL_MARKER in content.lower():
+                return Decision.END
+            sys.stdout.write(f"{content}\n")
+            sys.stdout.flush()
+            return Decision.THINK
+                
+        return Decision.END
+    
+    async def warmup(self) -> None:
+        # Opens the TCP/TLS connection of the async OpenAI client that call_model streams through
+        try:
+            await self._base_model.root_async_client.models.list()
+        except Exception:
+            logger.debug("OpenAI warmup request failed", exc_info=True)
+    
+    async def run_batch(self, queries: List[str], max_concurrency: int = 16) -> List[dict]:
+        inputs = [{ "messages" : [HumanMessage(content=q)] } for q in queries]
+        return await self.graph.abatch(inputs, config={ "max_concurrency" : max_concurrency })
+    
+
+_HTTP = httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(retries=3,
+                                                            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)),
+                          timeout=httpx.Timeout(5.0, connect=1.0))
+
+_CONFLICT_CACHE = TTLCache(maxsize=512, ttl=60)
+_CONFLICT_CACHE_LOCK = threading.Lock()
+
+@tool
+async def set_appointment(appointment_time: str, branch: int, name: str, expected_duration: int) -> str:
+    """Call this function to insert appointment instance into the database table. Make sure the data validation and integrity of
+    the appointment argument is upheld. If there is a lack of property values, please use `take_user_input` tool to elicit the
+    necessary information from the user.
+
+    Args:
+        appointment_time - datetime in ISO format as to when user set the appointment to
+        branch - what branch the customer got his appointment
+        name - the name of the user who reserved the slot
+        expected_duration - the amount of time in minutes how long the hair cut would take
+
+    Returns:
+        str: string representation of whether the insertion was successful.
+    """
+    
+    appointment = { "id": None, 
+                   "name": name, 
+                   "operation": None, 
+                   "branch": branch,
+                   "expected_duration": expected_duration, 
+                   "created_date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                   "appointment_datetime": appointment_time
+                }
+    
+    response = await _HTTP.post("http://localhost:8000/appointment", json=appointment)
+    if not response.is_success:
+        # Surfaces as an error-status ToolMessage, so the booking is not confirmed to the user
+        raise ToolException(response.text)
+    with _CONFLICT_CACHE_LOCK:
+        _CONFLICT_CACHE.clear()
+    return response.json()
+    
+
+@tool
+async def check_conflicting_appointment(dt: str, duration: int) -> str:
+    """Call this function to check if there is a conflicting appointment at barbershop with the requested datetime `dt` that will take `duration` minutes.
+
+    Args:
+        dt: str - appointment starting datetime in string ISO format
+        duration: int - expected amount of time barber might take in minutes
+
+    Returns:
+        str: tells if the requested datetime slot is free to make an appointment, otherwise, it will suggest another time when it is free.
+    """
+    
+    key = (dt, duration)
+    with _CONFLICT_CACHE_LOCK:
+        message = _CONFLICT_CACHE.get(key)
+    if message is not None:
+        return message
+    
+    response = await _HTTP.get("http://localhost:8000/check_conflict", params={"dt": dt, "duration": duration})
+    response_parsed = response.json()
+    with _CONFLICT_CACHE_LOCK:
+        _CONFLICT_CACHE[key] = response_parsed["message"]
+    return response_parsed["message"]
+
+class Slot(SchemaDict):
+    dt: str
+    duration: int
+
+@tool
+async def check_conflicts_batch(slots: List[Slot]) -> List[str]:
+    """Call this function instead of `check_conflicting_appointment` when you need to check several candidate slots at once.
+
+    Args:
+        slots: List[Slot] - candidate slots, each with `dt` starting datetime in string ISO format and `duration` in minutes
+
+    Returns:
+        List[str]: one answer per slot, in the same order, telling if it is free or suggesting another time when it is free.
+    """
+    
+    response = await _HTTP.post("http://localhost:8000/check_conflict_batch", json={"slots": slots})
+    response_parsed = response.json()
+    return response_parsed["messages"]
+
+_STDIN_LOCK = threading.Lock()
+
+def input_tool(assistant_label: str = "AI assistant", user_label: str = "Та") -> BaseTool:
+    # Entrypoints keep their own console framing while sharing one tool name and schema
+    @tool
+    def ask_user_for_input(user_prompt: str) -> str:
+        """Call this function to ask user for input data needed.
+        
+        Args:
+            user_prompt str: a string prompting user to insert the desired information.
+        
+        Returns:
+            str: the answer typed by the user
+        """
+        with _STDIN_LOCK:
+            user_response = input(f"\n{assistant_label}: " + user_prompt + f":\n> {user_label}: ")
+        return user_response
+    
+    return ask_user_for_input
+
+ask_user_for_input = input_tool()
+
+@tool
+async def get_current_datetime() -> str:
+    """Use this function to get the current timestamp in ISO format. This tool will help you have the sense of present date and time.
+    Returns: the current datetime in ISO format
+    """
+    return datetime.now().isoformat()
+
+
+@tool
+async def connect_to_human_operator() -> str:
+    """Use this when you are inquired of the business information you lack."""
+    return "FINAL STATE: Сайн байна уу? Та манай кассын ажилтантай холбогдлоо. Танд юугаар туслах вэ?"
+
+_BUSINESS_FAQ = (
+    ("хуваарь", "Өглөө 8:00 цагаас оройны 17 цаг хүртэл ажиллана."),
+    ("хаяг", "Манайд ганцхан салбар байгаа, Сүхбаатар дүүрэг Сити Тауэрийн 4 давхарт Чимэгэ салон heh."),
+)
+
+@tool
+async def browse_business_information(question: str) -> str:
+    """Use this tool to reply to the question asked by the user
+
+    Args:
+        question (str): question regarding the business operations of our barbershop
+
+    Returns:
+        str: response to the question if it is found in our documents; otherwise, it says it was not found
+    """
+    
+    q = question.lower()
+    for keyword, answer in _BUSINESS_FAQ:
+        if keyword in q:
+            return answer
+    
+    return "Response to the question was not found. Connect that person to a human operator, and finish."
@@ -1,8 +1,12 @@
 from langgraph.graph import START, END, StateGraph
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
 from typing import Annotated
 from typing_extensions import TypedDict
 from operator import add
+import os
+import sqlite3
+
+from uuid import uuid4
 
 class State(TypedDict):
     foo: int
@@ -23,9 +27,14 @@ workflow.add_edge(START, "node_a")
 workflow.add_edge("node_a", "node_b")
 workflow.add_edge("node_b", END)
 
-checkpointer = MemorySaver()
+# Kept apart from graph.py's checkpoints.db so the demo threads never mix with real conversations
+conn = sqlite3.connect("checkpoint_demo.db", check_same_thread=False)
+conn.execute("PRAGMA journal_mode=WAL")
+conn.execute("PRAGMA synchronous=NORMAL")
+checkpointer = SqliteSaver(conn)
 graph = workflow.compile(checkpointer=checkpointer)
 
-config = { "configurable" : { "thread_id" : "1" } }
+# A fresh thread per run; set CHECKPOINT_THREAD_ID to resume one
+config = { "configurable" : { "thread_id" : os.getenv("CHECKPOINT_THREAD_ID") or uuid4().hex } }
 graph.invoke({"foo": ""}, config)
 print(graph.get_state(config))
\ No newline at end of file
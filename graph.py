@@ -1,104 +1,33 @@
+import os
+import sys
+import asyncio
 import logging
-import requests
-from typing import Literal, List
-
-from langchain_core.messages import SystemMessage, AIMessage
+import aiosqlite
+import textwrap
 
-from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
-from langchain_core.utils.utils import convert_to_secret_str
+from uuid import uuid4
 
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import END, START, StateGraph, MessagesState
-from langgraph.prebuilt import ToolNode
+from queue import Queue
+from logging.handlers import QueueListener
 
-import os
-from datetime import datetime
 from dotenv import load_dotenv
 
-logging.basicConfig(filename="appointment_app_run_003.log", level=logging.INFO)
-logger = logging.getLogger("__main__")
-
-_ = load_dotenv()
-
-@tool
-def set_appointment(appointment_time: str, branch: int, name: str, expected_duration: int) -> str:
-    """Call this function to insert appointment instance into the database table. Make sure the data validation and integrity of
-    the appointment argument is upheld. If there is a lack of property values, please use `take_user_input` tool to elicit the
-    necessary information from the user.
-
-    Args:
-        appointment_time - datetime in ISO format as to when user set the appointment to
-        branch - what branch the customer got his appointment
-        name - the name of the user who reserved the slot
-        expected_duration - the amount of time in minutes how long the hair cut would take
-
-    Returns:
-        str: string representation of whether the insertion was successful.
-    """
-    
-    appointment = { "id": None, "name": name, "operation": None, "created_date": datetime.now().strftime("%d/%m/%Y, %H:%M:%S"),
-                   "expected_duration": expected_duration, "appointment_datetime": appointment_time, "branch": branch}
-    
-    print(f"Таны захиалгыг бүртгэлээ. {appointment_time}-д манай {branch}-р салбар дээр уулзацгаая.")
-    
-    response = requests.post("http://localhost:8000/appointment", json=appointment)
-    response_parsed = response.json()
-    return response_parsed
-    
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
-@tool
-def check_conflicting_appointment(dt: str, duration: int) -> str:
-    """Call this function to check if there is a conflicting appointment at barbershop with the requested datetime `dt` that will take `duration` minutes.
+from agent_core import DeferredQueueHandler
+from graph_core import build_app
 
-    Args:
-        dt: str - appointment starting datetime in string ISO format
-        duration: int - expected amount of time barber might take in minutes
-
-    Returns:
-        str: tells if the requested datetime slot is free to make an appointment, otherwise, it will suggest another time when it is free.
-    """
-    
-    print(f"Та түр хүлээгээрэй. {dt}-ийн үед үсчин маань сул эсэхийг шалгаж байна...")
-    response = requests.get(f"http://localhost:8000/check_conflict?dt={dt}&duration={duration}")
-    response_parsed = response.json()
-    return response_parsed["message"]
-
-@tool
-def ask_user_for_input(user_prompt: str) -> str:
-    """Call this function to ask user for input data needed.
-    
-    Args:
-        user_prompt str: a string prompting user to insert the desired information.
-    
-    Returns:
-        str: the answer typed by the user
-    """
-    user_response = input("\nAI Assistant: " + user_prompt + ":\n> User: ")
-    return user_response
-
-@tool
-def get_current_datetime() -> str:
-    """Use this function to get the current timestamp in ISO format. This tool will help you have the sense of present date and time.
-    Returns: the current datetime in ISO format
-    """
-    return datetime.now().isoformat()
-
-api_key = os.getenv("OPENAI_API_KEY", "")
-tools = [get_current_datetime, ask_user_for_input, set_appointment, check_conflicting_appointment]
-tool_node = ToolNode(tools)
-        
+log_queue = Queue(-1)
+logging.basicConfig(level=logging.INFO, handlers=[DeferredQueueHandler(log_queue)])
+listener = QueueListener(log_queue, logging.FileHandler("appointment_app_run_003.log"))
+logger = logging.getLogger("__main__")
 
-model = ChatOpenAI(model="gpt-4o-mini", api_key=convert_to_secret_str(api_key)).bind_tools(tools)
+_ = load_dotenv()
 
-def should_continue(state: MessagesState) -> str:
-    messages = state['messages']
-    last_message = messages[-1]
-    if isinstance(last_message, AIMessage) and last_message.tool_calls:
-        return "tools"
-    return END
+# A fresh thread per run; set GRAPH_THREAD_ID to resume a checkpointed conversation
+thread_id = os.getenv("GRAPH_THREAD_ID") or uuid4().hex
 
-system_prompt = """
+system_prompt = textwrap.dedent("""
     You are a barbershop AI agent that communicates in Mongolian language. You MUST follow this EXACT format for every interaction:
 
     Thought: First, explain your reasoning in English about what you need to do and why.
@@ -124,27 +53,24 @@ system_prompt = """
     Communicate with users in Mongolian but keep your Thought/Action/Observation in English.
 
     Never make up responses - use the provided tools for all interactions.
-"""
-
-def call_model(state: MessagesState):
-    messages = state['messages']
-    response = model.invoke(messages)
-    return {"messages": [response]}
-
-workflow = StateGraph(MessagesState)
-
-workflow.add_node("agent", call_model)
-workflow.add_node("tools", tool_node)
-
-workflow.add_edge(START, "agent")
-workflow.add_conditional_edges("agent", should_continue)
-workflow.add_edge("tools", "agent")
-
-checkpointer = MemorySaver()
-
-app = workflow.compile(checkpointer=checkpointer)
-
-entry_message = [SystemMessage(content=system_prompt)]
-context = app.invoke({"messages": entry_message}, config={"configurable": {"thread_id": 124563}})
-
-logger.info(context)
\ No newline at end of file
+""").strip()
+
+async def main():
+    async with aiosqlite.connect("checkpoints.db") as conn:
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        app = build_app(system_prompt, model_name="gpt-4o-mini", writer_model_name="gpt-4o", thread_id=thread_id, checkpointer=AsyncSqliteSaver(conn))
+        config = {"configurable": {"thread_id": thread_id}}
+        async for event in app.astream_events({"messages": []}, config=config, version="v2"):
+            if event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content:
+                sys.stdout.write(event["data"]["chunk"].content)
+                sys.stdout.flush()
+        context = (await app.aget_state(config)).values
+        
+    logger.info("thread_id=%s ctx=%s", thread_id, context)
+    
+listener.start()
+try:
+    asyncio.run(main())
+finally:
+    listener.stop()
@@ -0,0 +1,91 @@
+import os
+import operator
+
+from functools import lru_cache, reduce
+from itertools import takewhile
+from typing import List, Optional
+
+from langchain_openai import ChatOpenAI
+from langchain_core.tools import BaseTool
+from langchain_core.messages import AnyMessage, AIMessage, SystemMessage, ToolMessage, message_chunk_to_message
+from langchain_core.utils.utils import convert_to_secret_str
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph, MessagesState
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.prebuilt import ToolNode
+
+from agent_core import (
+    announce_tool_calls,
+    announce_tool_results,
+    get_current_datetime,
+    input_tool,
+    set_appointment,
+    check_conflicting_appointment
+)
+
+# graph.py's original console framing
+ask_user_for_input = input_tool("AI Assistant", "User")
+
+TOOLS: List[BaseTool] = [get_current_datetime, ask_user_for_input, set_appointment, check_conflicting_appointment]
+
+_TOOL_NODE = ToolNode(TOOLS, handle_tool_errors=True)
+_TOOL_SCHEMAS = [convert_to_openai_tool(t) for t in TOOLS]
+_FINAL_TOOLS = {set_appointment.name}
+
+@lru_cache(maxsize=None)
+def system_message(system_prompt: str) -> SystemMessage:
+    # Shared by every app built with the same prompt; messages are never mutated after construction
+    return SystemMessage(content=system_prompt)
+
+def should_continue(state: MessagesState) -> str:
+    last_message = state['messages'][-1]
+    if isinstance(last_message, AIMessage) and last_message.tool_calls:
+        announce_tool_calls(last_message.tool_calls)
+        return "tools"
+    return END
+
+def pick_model(state: MessagesState) -> str:
+    # Once a booking has been attempted the next reply is the user-facing conclusion; every other turn selects tools
+    results = takewhile(lambda m: isinstance(m, ToolMessage), reversed(state['messages']))
+    return "writer" if any(m.name in _FINAL_TOOLS for m in results) else "router"
+
+def after_tools(state: MessagesState) -> str:
+    announce_tool_results(state['messages'])
+    return pick_model(state)
+
+def _chat_model(model_name: str, thread_id: str) -> ChatOpenAI:
+    api_key = os.getenv("OPENAI_API_KEY", "")
+    return ChatOpenAI(model=model_name, api_key=convert_to_secret_str(api_key),
+                      model_kwargs={"user": str(thread_id), "tools": _TOOL_SCHEMAS})
+
+async def _complete(model: ChatOpenAI, messages: List[AnyMessage]) -> AIMessage:
+    chunks = [chunk async for chunk in model.astream(messages)]
+    return message_chunk_to_message(reduce(operator.add, chunks))
+
+def build_app(system_prompt: str, model_name: str = "gpt-4o-mini", writer_model_name: str = "gpt-4o", thread_id: str = "1",
+              checkpointer: Optional[BaseCheckpointSaver] = None) -> CompiledStateGraph:
+    router = _chat_model(model_name, thread_id)
+    writer = _chat_model(writer_model_name, thread_id)
+
+    system = system_message(system_prompt)
+
+    async def call_router(state: MessagesState):
+        return {"messages": [await _complete(router, [system, *state['messages']])]}
+
+    async def call_writer(state: MessagesState):
+        return {"messages": [await _complete(writer, [system, *state['messages']])]}
+
+    workflow = StateGraph(MessagesState)
+
+    workflow.add_node("router", call_router)
+    workflow.add_node("writer", call_writer)
+    workflow.add_node("tools", _TOOL_NODE)
+
+    workflow.add_conditional_edges(START, pick_model, ["router", "writer"])
+    workflow.add_conditional_edges("router", should_continue, ["tools", END])
+    workflow.add_conditional_edges("writer", should_continue, ["tools", END])
+    workflow.add_conditional_edges("tools", after_tools, ["router", "writer"])
+
+    return workflow.compile(checkpointer=checkpointer)
@@ -1,104 +1,195 @@
-from typing import Annotated, Sequence, Optional, Tuple, Literal, TypedDict
+from typing import Annotated, Sequence, Optional, Tuple, Literal, TypedDict, List
 from fastapi import FastAPI, Depends, HTTPException, Query
-from sqlmodel import SQLModel, Field, Session, select, create_engine
+from fastapi.responses import ORJSONResponse
+from sqlmodel import SQLModel, Field, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import Index, Row, and_, event, or_, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel.main import SQLModelMetaclass
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from dateutil import parser
+from bisect import bisect_left
 
 import logging
+import uvicorn
 from dotenv import load_dotenv
 
 _ = load_dotenv()
 
 sqlite_file_name = "database.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+sqlite_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
 
-connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args)
+engine = create_async_engine(sqlite_url, poolclass=AsyncAdaptedQueuePool, pool_size=10, max_overflow=20)
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+@event.listens_for(engine.sync_engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=134217728")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+async def create_db_and_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
     
-def get_session():
-    with Session(engine) as session:
+async def get_session():
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
         
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    await create_db_and_tables()
     yield
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
-class Appointment(SQLModel, table=True):
-    id: Optional[int] = Field(default=None, primary_key=True)
+# Upper bound on expected_duration; conflict queries use it as the lower edge of their index range
+MAX_DURATION = 8 * 60
+
+class AppointmentBase(SQLModel):
     name: Optional[str] = Field(default="Guest Anonymous")
     operation: Optional[str] = Field(default="Trimming hair length shorter", index=True)
-    created_date: str = Field(default=datetime.now().strftime("%d/%m/%Y, %H:%M:%S"))
     expected_duration: int = Field(default=30)
-    appointment_datetime: str
+    appointment_datetime: datetime = Field(index=True)
     branch: int
+
+class Appointment(AppointmentBase, table=True):
+    __table_args__ = (Index("ix_appt_window", "appointment_datetime", "end_datetime"),)
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_date: datetime = Field(default_factory=datetime.now, sa_column_kwargs={"server_default": text("(datetime('now', 'localtime'))")})
+    end_datetime: Optional[datetime] = Field(default=None, index=True)
+
+class AppointmentCreate(AppointmentBase):
+    # Table models skip validation, so request bodies are parsed through this model instead
+    expected_duration: int = Field(default=30, gt=0, le=MAX_DURATION)
+    created_date: Optional[datetime] = None
+
+def to_row(body: AppointmentCreate) -> Appointment:
+    # Every stored timestamp is naive local time, including the UTC stamp the agents send
+    start = to_local_naive(body.appointment_datetime)
+    created = to_local_naive(body.created_date) if body.created_date else datetime.now()
+    return Appointment.model_validate(body, update={"appointment_datetime": start,
+                                                    "end_datetime": start + timedelta(minutes=body.expected_duration),
+                                                    "created_date": created})
     
 @app.get("/appointment")
-def retrieve(session: SessionDep, offset: int = 0, limit: Annotated[int, Query(le=100)] = 100) -> Sequence[Appointment]:
-    orders = session.exec(select(Appointment).offset(offset).limit(limit)).all()
+async def retrieve(session: SessionDep, offset: int = 0, limit: Annotated[int, Query(le=100)] = 100) -> Sequence[Appointment]:
+    orders = (await session.exec(select(Appointment).offset(offset).limit(limit))).all()
     return orders
     
 @app.post("/appointment")
-def insert(order: Appointment, session: SessionDep) -> Appointment:
+async def insert(body: AppointmentCreate, session: SessionDep) -> Appointment:
+    order = to_row(body)
     session.add(order)
-    session.commit()
-    session.refresh(order)
+    await session.commit()
+    await session.refresh(order)
     return order
 
+@app.post("/appointment/bulk")
+async def bulk_insert(bodies: List[AppointmentCreate], session: SessionDep):
+    orders = [to_row(body) for body in bodies]
+    session.add_all(orders)
+    await session.commit()
+    return { "inserted": len(orders) }
+
+class Slot(SQLModel):
+    dt: str
+    duration: int
+    
+class SlotBatch(SQLModel):
+    slots: List[Slot]
+    
 @app.get("/check_conflict")
-def check_conflict(session: SessionDep, dt: str, duration: int):
-    response = check_datetime(session, dt, duration)
+async def check_conflict(session: SessionDep, dt: str, duration: int):
+    return { "message": conflict_message(await check_datetime(session, dt, duration), dt, duration) }
+
+@app.post("/check_conflict_batch")
+async def check_conflict_batch(session: SessionDep, batch: SlotBatch):
+    responses = await check_datetimes(session, batch.slots)
+    return { "messages": [conflict_message(response, slot.dt, slot.duration) for response, slot in zip(responses, batch.slots)] }
+
+def conflict_message(response: Tuple[bool, Optional[str], Optional[str]], dt: str, duration: int) -> str:
     if response[0]:
-        return { "message": f"Yes, you can order at {dt}. Your operation is expected to take {duration} minutes." }
+        return f"Yes, you can order at {dt}. Your operation is expected to take {duration} minutes."
     else:
-        return { "message": f"Sorry, there is a conflict of appointment at {dt}. However we suggest you to order at {response[2]}." }
+        return f"Sorry, there is a conflict of appointment at {dt}. However we suggest you to order at {response[2]}."
 
-def check_datetime(db_session: Session, requested_datetime: str, duration: int) -> Tuple[bool, Optional[str], Optional[str]]:
-    
-    check_time_window = 2
+def to_local_naive(dt: datetime) -> datetime:
+    # SQLite DateTime columns drop tzinfo, so everything is stored and compared as naive local time
+    return dt.astimezone().replace(tzinfo=None)
+
+def parse_datetime(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parser.parse(value)
+
+async def check_datetime(db_session: AsyncSession, requested_datetime: str, duration: int) -> Tuple[bool, Optional[str], Optional[str]]:
     
-    requested_dt = parser.parse(requested_datetime).astimezone()
+    requested_dt = to_local_naive(parse_datetime(requested_datetime))
     requested_end_dt = requested_dt + timedelta(minutes=duration)
     
-    # Potentially conflicting appointment spanning 2 hours either direction
+    # Earliest overlapping appointment
     
-    statement = select(Appointment).where(
-        Appointment.appointment_datetime.between(
-            (requested_dt - timedelta(hours=check_time_window)).isoformat(),
-            (requested_dt + timedelta(hours=check_time_window)).isoformat()
-        )
-    )
-    appointments = db_session.exec(statement).all()
+    statement = select(Appointment.appointment_datetime, Appointment.end_datetime).where(
+        Appointment.appointment_datetime >= requested_dt - timedelta(minutes=MAX_DURATION),
+        Appointment.appointment_datetime <= requested_end_dt,
+        Appointment.end_datetime >= requested_dt
+    ).order_by(Appointment.appointment_datetime)
+    appointment = (await db_session.exec(statement)).first()
     
-    # Check if there is an overlapping appointment
-    for appointment in appointments:
-        appointment_dt = parser.parse(appointment.appointment_datetime).astimezone()
-        appointment_end_dt = appointment_dt + timedelta(minutes=appointment.expected_duration)
-        
-        if ((requested_dt <= appointment_end_dt and requested_end_dt >= appointment_dt) 
-            or 
-            (appointment_dt <= requested_end_dt and appointment_end_dt >= requested_dt)):
-            
-            # There is an overlap
-            if requested_dt < appointment_dt:
-                # Requested time starts before existing appointment
-                return (False, f"There is an appointment at {appointment.appointment_datetime}, right after your requested time.", appointment_end_dt.isoformat())
-            
-            else:
-                # Requested time starts during or after existing appointment
-                return (False, f"We got an appointment starting at {appointment.appointment_datetime} and through your requested time.", appointment_end_dt.isoformat())
-
-        # Check if another appointment starts during the requested operation
-        if appointment_dt > requested_dt and appointment_dt < requested_end_dt:
-            return (False, f"Another appointment starts during {appointment.appointment_datetime}", appointment_end_dt.isoformat())
-    
-    return (True, None, None)
\ No newline at end of file
+    if appointment is None:
+        return (True, None, None)
+    return conflict_result(requested_dt, appointment)
+
+async def check_datetimes(db_session: AsyncSession, slots: List[Slot]) -> List[Tuple[bool, Optional[str], Optional[str]]]:
+    if not slots:
+        return []
+    
+    windows = [(dt, dt + timedelta(minutes=slot.duration)) for dt, slot in
+               ((to_local_naive(parse_datetime(slot.dt)), slot) for slot in slots)]
+    
+    # One query bounded to the requested windows, fetching only the two columns the overlap test needs
+    
+    reach = timedelta(minutes=MAX_DURATION)
+    statement = select(Appointment.appointment_datetime, Appointment.end_datetime).where(
+        or_(*(and_(Appointment.appointment_datetime >= start - reach,
+                   Appointment.appointment_datetime <= end,
+                   Appointment.end_datetime >= start) for start, end in windows))
+    ).order_by(Appointment.appointment_datetime)
+    appointments = (await db_session.exec(statement)).all()
+    starts = [a.appointment_datetime for a in appointments]
+    
+    responses = []
+    for requested_dt, requested_end_dt in windows:
+        # Rows are sorted by start, so each slot only scans the candidates starting within its reach
+        i, appointment = bisect_left(starts, requested_dt - reach), None
+        while appointment is None and i < len(appointments) and starts[i] <= requested_end_dt:
+            if appointments[i].end_datetime >= requested_dt:
+                appointment = appointments[i]
+            i += 1
+        responses.append((True, None, None) if appointment is None else conflict_result(requested_dt, appointment))
+    return responses
+
+def conflict_result(requested_dt: datetime, appointment: Row) -> Tuple[bool, Optional[str], Optional[str]]:
+    appointment_dt = appointment.appointment_datetime
+    appointment_end_dt = appointment.end_datetime
+    
+    if requested_dt < appointment_dt:
+        # Requested time starts before existing appointment
+        return (False, f"There is an appointment at {appointment_dt.isoformat()}, right after your requested time.", appointment_end_dt.isoformat())
+    
+    # Requested time starts during or after existing appointment
+    return (False, f"We got an appointment starting at {appointment_dt.isoformat()} and through your requested time.", appointment_end_dt.isoformat())
+
+
+if __name__ == "__main__":
+    uvicorn.run("main:app", loop="uvloop", http="httptools")
@@ -1,8 +1,9 @@
-import requests
+import httpx
+import asyncio
 import logging
 from datetime import datetime
 
-def main():
+async def main():
     logging.basicConfig(filename="insert.log", level=logging.INFO)
     
     appointments = [
@@ -12,16 +13,14 @@ def main():
         {"appointment_datetime": datetime(2025, 1, 7, 15, 0, 0).isoformat(), "expected_duration": 60, "branch": 1, "operation": "Trimming hair branches"}
     ]
     
-    urlstring = "http://localhost:8000/order"
+    urlstring = "/appointment/bulk"
     
     logger = logging.getLogger(__name__)
     
-    response = []
-    for appointment in appointments:
-        data = requests.post(urlstring, json=appointment)
-        response.append(data.content)
+    async with httpx.AsyncClient(base_url="http://localhost:8000", timeout=10) as client:
+        response = await client.post(urlstring, json=appointments)
         
-    logger.info(response)
+    logger.info(response.content)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    # main.py opens database.db relative to the working directory on first connect
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("db"))
+    import main
+    try:
+        with TestClient(main.app) as c:
+            yield c
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,115 @@
+import gc
+import asyncio
+import weakref
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+
+import agent_core
+from agent_core import Agent
+
+
+@tool
+async def opening_hours() -> str:
+    """Returns the opening hours of the barbershop."""
+    return "08:00-17:00"
+
+
+class ScriptedModel(BaseChatModel):
+    # Asks for the opening hours first, then finishes with its tag once a tool result is in the history
+    tag: str
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"tag": self.tag}
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        if any(m.type == "tool" for m in messages):
+            message = AIMessage(content=f"final state: {self.tag}")
+        else:
+            message = AIMessage(content="", tool_calls=[{"name": "opening_hours", "args": {}, "id": "call_1"}])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def test_completions_are_shared_across_agents_with_the_same_model_settings():
+    agent_core._COMPLETIONS.clear()
+    first, second = ScriptedModel(tag="shared"), ScriptedModel(tag="shared")
+    query = {"messages": [HumanMessage(content="cache me")]}
+
+    asyncio.run(Agent(first, [opening_hours]).graph.ainvoke(query))
+    result = asyncio.run(Agent(second, [opening_hours]).graph.ainvoke(query))
+
+    assert result["messages"][-1].content == "final state: shared"
+    assert (first.calls, second.calls) == (2, 0)
+
+    other = ScriptedModel(tag="other")
+    asyncio.run(Agent(other, [opening_hours]).graph.ainvoke(query))
+    assert other.calls == 2
+
+
+def test_completion_store_survives_a_cleared_memory_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(agent_core, "_COMPLETION_STORE", None)
+    agent_core._COMPLETIONS.clear()
+    agent_core.use_completion_store(str(tmp_path / "completions.db"))
+    query = {"messages": [HumanMessage(content="persist me")]}
+
+    asyncio.run(Agent(ScriptedModel(tag="stored"), [opening_hours]).graph.ainvoke(query))
+    agent_core._COMPLETIONS.clear()
+    replay = ScriptedModel(tag="stored")
+    result = asyncio.run(Agent(replay, [opening_hours]).graph.ainvoke(query))
+
+    assert replay.calls == 0
+    assert result["messages"][-3].tool_calls[0]["name"] == "opening_hours"
+    assert result["messages"][-1].content == "final state: stored"
+
+
+def test_booking_is_confirmed_only_after_a_successful_set_appointment(capsys):
+    call = {"name": "set_appointment", "args": {"appointment_time": "2025-02-03T10:00:00", "branch": 1}, "id": "call_1"}
+    request = AIMessage(content="", tool_calls=[call])
+
+    agent_core.announce_tool_results([request])
+    assert capsys.readouterr().out == ""
+
+    agent_core.announce_tool_results([request, ToolMessage(content="{}", name="set_appointment", tool_call_id="call_1")])
+    assert "2025-02-03T10:00:00-д манай 1-р салбар" in capsys.readouterr().out
+
+    failed = ToolMessage(content="Error: 500", name="set_appointment", tool_call_id="call_1", status="error")
+    agent_core.announce_tool_results([request, failed])
+    assert capsys.readouterr().out == ""
+
+
+def test_agents_on_the_same_tools_share_one_graph_but_answer_with_their_own_models():
+    first, second = Agent(ScriptedModel(tag="first"), [opening_hours]), Agent(ScriptedModel(tag="second"), [opening_hours])
+    assert first.graph.bound is second.graph.bound
+
+    query = {"messages": [HumanMessage(content="who answers?")]}
+    assert asyncio.run(first.graph.ainvoke(query))["messages"][-1].content == "final state: first"
+    assert asyncio.run(second.graph.ainvoke(query))["messages"][-1].content == "final state: second"
+
+    results = asyncio.run(first.run_batch(["one", "two"]))
+    assert [r["messages"][-1].content for r in results] == ["final state: first"] * 2
+    results = asyncio.run(second.run_batch(["one", "two"]))
+    assert [r["messages"][-1].content for r in results] == ["final state: second"] * 2
+
+
+def test_shared_graph_does_not_keep_a_dropped_agent_alive():
+    agent = Agent(ScriptedModel(tag="dropped"), [opening_hours])
+    asyncio.run(agent.graph.ainvoke({"messages": [HumanMessage(content="bye")]}))
+    ref = weakref.ref(agent)
+
+    del agent
+    gc.collect()
+
+    assert ref() is None
+    assert agent_core.tool_graph([opening_hours]) in agent_core._GRAPH_CACHE.values()
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Any
+
+import httpx
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import agent_core
+import graph_core
+
+BOOKING = {"appointment_time": "2025-02-03T10:00:00", "branch": 1, "name": "Bat", "expected_duration": 30}
+
+
+class ScriptedModel(BaseChatModel):
+    # Replays its script one message per call and records which model name answered
+    name: str
+    script: list
+    log: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.log.append(self.name)
+        return ChatResult(generations=[ChatGeneration(message=self.script.pop(0))])
+
+
+def run_booking(monkeypatch, status_code: int) -> tuple:
+    log = []
+    scripts = {
+        "gpt-4o-mini": [AIMessage(content="", tool_calls=[{"name": "get_current_datetime", "args": {}, "id": "call_1"}]),
+                        AIMessage(content="", tool_calls=[{"name": "set_appointment", "args": BOOKING, "id": "call_2"}])],
+        "gpt-4o": [AIMessage(content="FINAL STATE: done")],
+    }
+    monkeypatch.setattr(graph_core, "_chat_model", lambda name, thread_id: ScriptedModel(name=name, script=scripts[name], log=log))
+    transport = httpx.MockTransport(lambda request: httpx.Response(status_code, json={"id": 1} if status_code == 200 else {"detail": "boom"}))
+    monkeypatch.setattr(agent_core, "_HTTP", httpx.AsyncClient(transport=transport))
+
+    result = asyncio.run(graph_core.build_app("system").ainvoke({"messages": []}))
+    return log, result["messages"]
+
+
+@pytest.mark.parametrize("status_code", [200, 500])
+def test_tool_turns_use_the_router_and_the_reply_after_booking_uses_the_writer(monkeypatch, capsys, status_code):
+    log, messages = run_booking(monkeypatch, status_code)
+
+    assert log == ["gpt-4o-mini", "gpt-4o-mini", "gpt-4o"]
+    assert messages[-1].content == "FINAL STATE: done"
+
+    booking = messages[-2]
+    assert booking.name == "set_appointment"
+    assert booking.status == ("success" if status_code == 200 else "error")
+    assert ("Таны захиалгыг бүртгэлээ" in capsys.readouterr().out) == (status_code == 200)
@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+
+def test_insert_parses_iso_appointment_datetime(client):
+    response = client.post("/appointment", json={"id": None, "name": "Bat", "operation": None, "branch": 1,
+                                                 "expected_duration": 45, "appointment_datetime": "2025-02-03T10:00:00"})
+    assert response.status_code == 200
+    created = response.json()
+    assert datetime.fromisoformat(created["appointment_datetime"]) == datetime(2025, 2, 3, 10, 0)
+    assert datetime.fromisoformat(created["end_datetime"]) == datetime(2025, 2, 3, 10, 45)
+
+    rows = client.get("/appointment").json()
+    row = next(r for r in rows if r["id"] == created["id"])
+    assert row["name"] == "Bat"
+    assert datetime.fromisoformat(row["appointment_datetime"]) == datetime(2025, 2, 3, 10, 0)
+
+
+def test_bulk_insert_stores_every_appointment(client):
+    appointments = [
+        {"appointment_datetime": "2025-02-04T10:00:00", "expected_duration": 90, "branch": 1, "operation": "Trimming hair branches"},
+        {"appointment_datetime": "2025-02-04T13:30:00", "expected_duration": 30, "branch": 1, "operation": "Trimming hair branches"},
+    ]
+    response = client.post("/appointment/bulk", json=appointments)
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 2}
+
+    rows = [r for r in client.get("/appointment").json() if r["appointment_datetime"].startswith("2025-02-04")]
+    assert sorted(datetime.fromisoformat(r["end_datetime"]) for r in rows) == [datetime(2025, 2, 4, 11, 30), datetime(2025, 2, 4, 14, 0)]
+
+
+def test_created_date_is_stored_as_naive_local_time(client):
+    sent = datetime(2025, 2, 5, 2, 0, tzinfo=timezone.utc)
+    stamped = client.post("/appointment", json={"branch": 1, "appointment_datetime": "2025-02-05T10:00:00",
+                                                "created_date": sent.isoformat(timespec="seconds")}).json()
+    assert datetime.fromisoformat(stamped["created_date"]) == sent.astimezone().replace(tzinfo=None)
+
+    defaulted = client.post("/appointment", json={"branch": 1, "appointment_datetime": "2025-02-05T11:00:00"}).json()
+    assert datetime.fromisoformat(defaulted["created_date"]).tzinfo is None
+
+
+def test_conflict_batch_matches_single_checks(client):
+    client.post("/appointment/bulk", json=[
+        {"appointment_datetime": "2025-02-06T10:00:00", "expected_duration": 60, "branch": 1},
+        {"appointment_datetime": "2025-02-09T15:00:00", "expected_duration": 30, "branch": 1},
+        {"appointment_datetime": "2025-02-12T08:00:00", "expected_duration": 360, "branch": 1},
+    ])
+    slots = [{"dt": "2025-02-06T10:30:00", "duration": 30}, {"dt": "2025-02-07T12:00:00", "duration": 30},
+             {"dt": "2025-02-09T14:45:00", "duration": 30}, {"dt": "2025-02-12T13:00:00", "duration": 30}]
+
+    batch = client.post("/check_conflict_batch", json={"slots": slots}).json()["messages"]
+    single = [client.get("/check_conflict", params=slot).json()["message"] for slot in slots]
+    assert batch == single
+    assert batch[1].startswith("Yes")
+    assert "2025-02-06T11:00:00" in batch[0] and "2025-02-09T15:30:00" in batch[2] and "2025-02-12T14:00:00" in batch[3]
+
+
+def test_long_appointment_still_conflicts_and_duration_is_capped(client):
+    from main import MAX_DURATION
+
+    client.post("/appointment", json={"branch": 1, "appointment_datetime": "2025-02-10T08:00:00", "expected_duration": 300})
+    message = client.get("/check_conflict", params={"dt": "2025-02-10T12:00:00", "duration": 30}).json()["message"]
+    assert message.startswith("Sorry") and "2025-02-10T13:00:00" in message
+
+    response = client.post("/appointment", json={"branch": 1, "appointment_datetime": "2025-02-11T08:00:00",
+                                                 "expected_duration": MAX_DURATION + 1})
+    assert response.status_code == 422